@@ -17,6 +17,7 @@ JIRA_ISSUE_TYPE = ""  # Default issue type: Task works for SAT project
 
 # Groq AI Configuration (FREE - Get from https://console.groq.com/keys)
 GROQ_API_KEY = ""
+GROQ_CACHE_TTL_DAYS = 7  # How long AI analyses are reused for an unchanged thread
 
 # =============================================================================
 # END CONFIGURATION
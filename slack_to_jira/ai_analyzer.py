@@ -3,97 +3,401 @@ AI analyzer using Groq to analyze Slack discussions.
 """
 
 import re
-import json
-import requests
+import time
+import random
+import struct
+import hashlib
+from typing import Optional
+
+from . import jsonlib
+from .cache import CACHE_DIR, open_cache_db
+from .session import build_session
+
+
+MODEL = "llama-3.1-8b-instant"
+TEMPERATURE = 0.3
+
+# The fixed prompt text goes first and stays byte-identical between calls
+# so the provider can reuse its cached prefix; per-thread text comes last.
+SYSTEM_PROMPT = (
+    "You are a helpful assistant that creates Jira issues from Slack discussions. "
+    "Always respond with valid JSON only."
+)
+
+INSTRUCTIONS_HEADER = """Analyze the Slack discussion below and create a Jira issue based on it.
+
+Provide a JSON response with:
+1. "title": A concise, descriptive title for the Jira issue (max 100 chars)
+2. "summary": A detailed description capturing the problem, context, and any solutions discussed. Use Jira markup (* for bullets, *bold* for emphasis, h3. for headers)
+3. "issue_type": One of: Bug, Task, Story, Improvement
+4. "priority": One of: Blocker, Critical, Major, Minor, Trivial
+
+Respond with ONLY valid JSON, no markdown, no explanation."""
+
+# Identifies the prompt in cache entries, so editing it invalidates old analyses
+PROMPT_DIGEST = hashlib.blake2b(
+    f"{SYSTEM_PROMPT}\0{INSTRUCTIONS_HEADER}".encode("utf-8"), digest_size=8
+).hexdigest()
+
+# A lone message with less text than this gives the model nothing to summarize
+TRIVIAL_THREAD_CHARS = 200
+
+# Default lifetime of a cached analysis, in seconds
+ANALYSIS_CACHE_TTL = 7 * 24 * 3600
+
+# Bump when the shape of the cached analysis dict changes
+ANALYSIS_SCHEMA_VERSION = 1
+
+# Near-duplicate lookup: MinHash signatures split into LSH bands. With
+# 16 bands of 4 rows, threads at the similarity threshold almost always
+# share at least one band, while unrelated threads rarely do.
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16
+SEMANTIC_MIN_SIMILARITY = 0.85
+SEMANTIC_SCAN_LIMIT = 200
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(0x5EED)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(MINHASH_PERMUTATIONS)
+]
+del _rng
+
+# Parts of the formatted thread that vary between otherwise identical runs
+_TIMESTAMP_RE = re.compile(r'^\[\d{4}-\d{2}-\d{2}(?: \d{2}:\d{2})?\] ', re.MULTILINE)
+_USER_ID_RE = re.compile(r'<@[A-Z0-9]+(?:\|[^>]*)?>|\b[UW][A-Z0-9]{8,}\b')
+
+# Prompt budget for the thread content; roughly 4 characters per token
+MAX_PROMPT_TOKENS = 1500
+
+_MINUTE_RE = re.compile(r'^\[(\d{4}-\d{2}-\d{2}) \d{2}:\d{2}\]', re.MULTILINE)
+_BLANK_LINES_RE = re.compile(r'\n(?:[ \t]*\n){3,}')
+
+# Markdown code fences the model sometimes wraps its JSON in
+_FENCE_RE = re.compile(r'```(?:json)?\s*')
+
+
+def _normalize_for_cache(thread_content: str) -> str:
+    """Strip timestamps and user IDs so equivalent threads hash the same."""
+    text = _TIMESTAMP_RE.sub('', thread_content)
+    text = _USER_ID_RE.sub('', text)
+    return " ".join(text.split())
+
+
+def _minhash(normalized: str) -> list[int]:
+    """MinHash signature over 3-word shingles of normalized thread text."""
+    words = normalized.lower().split()
+    shingles = {" ".join(words[i:i + 3]) for i in range(max(1, len(words) - 2))}
+    hashes = [
+        int.from_bytes(hashlib.blake2b(sh.encode("utf-8"), digest_size=8).digest(), "little")
+        for sh in shingles
+    ]
+    return [
+        min((a * h + b) % _MERSENNE_PRIME for h in hashes)
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def _lsh_bands(signature: list[int]) -> list[str]:
+    """Bucket keys for each band of a MinHash signature."""
+    rows = len(signature) // LSH_BANDS
+    return [
+        f"{band}:" + hashlib.blake2b(
+            struct.pack(f"<{rows}Q", *signature[band * rows:(band + 1) * rows]),
+            digest_size=8
+        ).hexdigest()
+        for band in range(LSH_BANDS)
+    ]
+
+
+def _compact_for_llm(text: str, max_tokens: int = MAX_PROMPT_TOKENS) -> str:
+    """
+    Shrink formatted thread text before it goes into the prompt.
+    
+    Drops the time of day from message headers, repeated file lines and
+    runs of blank lines. If still over budget, cuts from the middle so the
+    opening messages and the resolution both survive.
+    """
+    text = _MINUTE_RE.sub(r'[\1]', text)
+    
+    seen_files = set()
+    lines = []
+    for line in text.split('\n'):
+        if line.startswith('[File: '):
+            if line in seen_files:
+                continue
+            seen_files.add(line)
+        lines.append(line)
+    text = _BLANK_LINES_RE.sub('\n\n', '\n'.join(lines))
+    
+    max_chars = max_tokens * 4
+    if len(text) // 4 > max_tokens:
+        head = int(max_chars * 0.6)
+        tail = max_chars - head
+        text = f"{text[:head]}\n[...]\n{text[-tail:]}"
+    return text
+
+
+def _extract_json(text: str):
+    """
+    Return the first balanced {...} object in text, or None.
+    
+    Single forward pass that tracks string/escape state so braces inside
+    JSON strings don't affect nesting depth.
+    """
+    start = text.find('{')
+    if start < 0:
+        return None
+    
+    depth = 0
+    in_str = False
+    esc = False
+    for i in range(start, len(text)):
+        c = text[i]
+        if in_str:
+            if esc:
+                esc = False
+            elif c == '\\':
+                esc = True
+            elif c == '"':
+                in_str = False
+        elif c == '"':
+            in_str = True
+        elif c == '{':
+            depth += 1
+        elif c == '}':
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return None
 
 
 class GroqAnalyzer:
     """Use Groq AI (FREE) to analyze Slack discussions."""
     
-    def __init__(self, api_key: str):
+    _cache_path = CACHE_DIR / "groq.sqlite"
+    
+    def __init__(self, api_key: str, cache_ttl: int = ANALYSIS_CACHE_TTL):
         self.api_key = api_key
+        self.cache_ttl = cache_ttl
         self.api_url = "https://api.groq.com/openai/v1/chat/completions"
         self.headers = {
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json"
         }
+        self.session = build_session(self.headers)
+        self._cache_db = open_cache_db(self._cache_path)
+        self._cache_db.execute(
+            "CREATE TABLE IF NOT EXISTS analyses("
+            "key TEXT PRIMARY KEY, schema_version INTEGER, result TEXT, created_at INTEGER)"
+        )
+        self._cache_db.execute(
+            "CREATE TABLE IF NOT EXISTS signatures("
+            "key TEXT PRIMARY KEY, model TEXT, channel TEXT, minhash BLOB, created_at INTEGER)"
+        )
+        self._cache_db.execute(
+            "CREATE TABLE IF NOT EXISTS lsh_bands(band TEXT, key TEXT, PRIMARY KEY (band, key))"
+        )
+        self._cache_db.commit()
+    
+    def _cache_key(self, normalized: str, channel_name: str) -> str:
+        """Hash everything that influences the model's answer."""
+        digest = hashlib.blake2b()
+        for part in (MODEL, str(TEMPERATURE), PROMPT_DIGEST, normalized, channel_name):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+    
+    def _load_cached(self, key: str):
+        """Return a fresh cached analysis for this key, if any."""
+        row = self._cache_db.execute(
+            "SELECT result FROM analyses "
+            "WHERE key = ? AND schema_version = ? AND created_at >= ?",
+            (key, ANALYSIS_SCHEMA_VERSION, int(time.time()) - self.cache_ttl)
+        ).fetchone()
+        return jsonlib.loads(row[0]) if row else None
     
-    def analyze_thread(self, thread_content: str, channel_name: str = "") -> dict:
+    def _load_similar(self, signature: list[int], channel_name: str):
+        """
+        Find a cached analysis of a near-identical thread in the same channel.
+        
+        Candidates share at least one LSH band and are among the most recent
+        entries; the best one is accepted if its estimated Jaccard similarity
+        clears SEMANTIC_MIN_SIMILARITY. Returns (analysis, similarity) or None.
+        """
+        bands = _lsh_bands(signature)
+        rows = self._cache_db.execute(
+            f"SELECT s.key, s.minhash FROM signatures s "
+            f"WHERE s.model = ? AND s.channel = ? AND s.created_at >= ? "
+            f"AND s.key IN (SELECT key FROM lsh_bands WHERE band IN ({','.join('?' * len(bands))})) "
+            f"ORDER BY s.created_at DESC LIMIT ?",
+            (f"{MODEL}:{PROMPT_DIGEST}", channel_name, int(time.time()) - self.cache_ttl,
+             *bands, SEMANTIC_SCAN_LIMIT)
+        ).fetchall()
+        
+        best_key, best_similarity = None, 0.0
+        for key, blob in rows:
+            other = struct.unpack(f"<{MINHASH_PERMUTATIONS}Q", blob)
+            similarity = sum(a == b for a, b in zip(signature, other)) / MINHASH_PERMUTATIONS
+            if similarity > best_similarity:
+                best_key, best_similarity = key, similarity
+        
+        if best_key is None or best_similarity < SEMANTIC_MIN_SIMILARITY:
+            return None
+        analysis = self._load_cached(best_key)
+        if analysis is None:
+            return None
+        return analysis, best_similarity
+    
+    def _store_cached(self, key: str, analysis: dict, signature: list[int], channel_name: str):
+        """
+        Persist an analysis produced by the model, with its MinHash signature.
+        
+        Expired entries are pruned in the same transaction so the cache
+        file doesn't grow without bound.
+        """
+        now = int(time.time())
+        expired = now - self.cache_ttl
+        with self._cache_db:
+            self._cache_db.execute(
+                "DELETE FROM analyses WHERE created_at < ? OR schema_version != ?",
+                (expired, ANALYSIS_SCHEMA_VERSION)
+            )
+            self._cache_db.execute(
+                "DELETE FROM lsh_bands WHERE key IN "
+                "(SELECT key FROM signatures WHERE created_at < ?)",
+                (expired,)
+            )
+            self._cache_db.execute("DELETE FROM signatures WHERE created_at < ?", (expired,))
+            self._cache_db.execute(
+                "INSERT OR REPLACE INTO analyses(key, schema_version, result, created_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, ANALYSIS_SCHEMA_VERSION, jsonlib.dumps(analysis), now)
+            )
+            self._cache_db.execute(
+                "INSERT OR REPLACE INTO signatures(key, model, channel, minhash, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, f"{MODEL}:{PROMPT_DIGEST}", channel_name,
+                 struct.pack(f"<{MINHASH_PERMUTATIONS}Q", *signature), now)
+            )
+            self._cache_db.executemany(
+                "INSERT OR IGNORE INTO lsh_bands(band, key) VALUES (?, ?)",
+                [(band, key) for band in _lsh_bands(signature)]
+            )
+    
+    def analyze_thread(
+        self,
+        thread_content: str,
+        channel_name: str = "",
+        force_refresh: bool = False,
+        display_content: Optional[str] = None,
+        message_count: int = 0
+    ) -> dict:
         """
         Analyze a Slack thread and generate Jira issue content.
         
+        Results are cached on disk by thread content. A near-identical
+        thread from the same channel (e.g. one late reply added) reuses the
+        earlier analysis too; such hits carry "cache": "semantic" and the
+        estimated "similarity". Pass force_refresh to bypass the cache and
+        ask the model again.
+        
+        A thread of a single short message (under TRIVIAL_THREAD_CHARS of
+        text) skips the model entirely and is returned as-is with
+        "analysis_source": "trivial".
+        
+        Args:
+            thread_content: Thread text sent to the model
+            channel_name: Slack channel the thread came from
+            force_refresh: Ignore cached analyses
+            display_content: Human-readable thread text used when the model
+                is skipped or fails; defaults to thread_content
+            message_count: Number of messages in the thread; the trivial
+                shortcut only applies when this is 1
+        
         Returns:
             dict with 'title', 'summary', 'issue_type', and 'priority'
         """
-        prompt = f"""Analyze the following Slack discussion and create a Jira issue based on it.
-
-Channel: {channel_name if channel_name else 'Unknown'}
-
-Slack Thread Content:
----
-{thread_content[:4000]}
----
-
-Based on this discussion, provide a JSON response with:
-1. "title": A concise, descriptive title for the Jira issue (max 100 chars)
-2. "summary": A detailed description capturing the problem, context, and any solutions discussed. Use Jira markup (* for bullets, *bold* for emphasis, h3. for headers)
-3. "issue_type": One of: Bug, Task, Story, Improvement
-4. "priority": One of: Blocker, Critical, Major, Minor, Trivial
-
-Respond with ONLY valid JSON, no markdown, no explanation:"""
+        display_content = display_content or thread_content
+        # Measure the message text only, not its "[stamp] Name:" header line
+        message_text = display_content.partition('\n')[2].strip()
+        if message_count == 1 and len(message_text) < TRIVIAL_THREAD_CHARS:
+            return {**self._fallback_analysis(display_content), "analysis_source": "trivial"}
+        
+        content = _compact_for_llm(thread_content)
+        normalized = _normalize_for_cache(content)
+        cache_key = self._cache_key(normalized, channel_name)
+        # MinHash is comparatively costly; only compute it past an exact miss
+        signature = None
+        if not force_refresh:
+            cached = self._load_cached(cache_key)
+            if cached is not None:
+                return {**cached, "cache": "exact"}
+            signature = _minhash(normalized)
+            similar = self._load_similar(signature, channel_name)
+            if similar is not None:
+                cached, similarity = similar
+                return {**cached, "cache": "semantic", "similarity": round(similarity, 3)}
+        
+        prompt = (
+            f"{INSTRUCTIONS_HEADER}\n\n"
+            f"Channel: {channel_name if channel_name else 'Unknown'}\n\n"
+            f"Slack Thread Content:\n---\n{content}\n---"
+        )
 
         payload = {
-            "model": "llama-3.1-8b-instant",
+            "model": MODEL,
             "messages": [
                 {
                     "role": "system",
-                    "content": "You are a helpful assistant that creates Jira issues from Slack discussions. Always respond with valid JSON only."
+                    "content": SYSTEM_PROMPT
                 },
                 {
                     "role": "user", 
                     "content": prompt
                 }
             ],
-            "temperature": 0.3,
+            "temperature": TEMPERATURE,
             "max_tokens": 1000
         }
 
-        response = requests.post(
+        response = self.session.post(
             self.api_url,
-            headers=self.headers,
             json=payload,
             timeout=60
         )
         
         if response.status_code != 200:
-            error_msg = response.text
+            # Parse the raw bytes once; only decode the body as text if needed
             try:
-                error_json = response.json()
-                if "error" in error_json:
-                    error_msg = error_json["error"].get("message", response.text)
-            except:
-                pass
+                error_json = jsonlib.loads(response.content)
+                error_msg = error_json["error"]["message"]
+            except Exception:
+                error_msg = response.text
             raise Exception(f"Groq API error: {response.status_code} - {error_msg}")
         
-        result = response.json()
+        result = jsonlib.loads(response.content)
         response_text = result["choices"][0]["message"]["content"]
         
         # Extract JSON from response
         try:
             # Clean up response - remove markdown code blocks if present
-            cleaned = re.sub(r'```json\s*', '', response_text)
-            cleaned = re.sub(r'```\s*', '', cleaned)
+            cleaned = _FENCE_RE.sub('', response_text)
             
             # Try to find JSON in the response
-            json_match = re.search(r'\{[\s\S]*\}', cleaned)
-            if json_match:
-                parsed = json.loads(json_match.group())
+            json_text = _extract_json(cleaned)
+            if json_text:
+                parsed = jsonlib.loads(json_text)
                 # Validate required fields
                 if "title" in parsed and "summary" in parsed:
+                    if signature is None:
+                        signature = _minhash(normalized)
+                    self._store_cached(cache_key, parsed, signature, channel_name)
                     return parsed
             raise ValueError("No valid JSON found in response")
-        except (json.JSONDecodeError, ValueError):
-            return self._fallback_analysis(thread_content)
+        except ValueError:
+            return self._fallback_analysis(display_content)
     
     def _fallback_analysis(self, thread_content: str) -> dict:
         """Fallback if AI analysis fails - create basic issue from content."""
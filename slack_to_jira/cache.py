@@ -0,0 +1,20 @@
+"""
+Local on-disk caches shared across runs.
+"""
+
+import sqlite3
+from pathlib import Path
+
+
+CACHE_DIR = Path.home() / ".cache" / "slack_to_jira"
+
+
+def open_cache_db(path: Path) -> sqlite3.Connection:
+    """
+    Open (and create if needed) a SQLite cache database.
+    
+    The connection may be used from worker threads; callers serialize
+    access themselves.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return sqlite3.connect(str(path), check_same_thread=False)
@@ -3,9 +3,9 @@ Command-line interface for Slack to Jira converter.
 """
 
 import sys
-import json
 import argparse
 
+from . import jsonlib
 from .converter import SlackToJira
 
 
@@ -44,6 +44,11 @@ Configuration:
         action="store_true",
         help="Show what would be created without actually creating"
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Re-run AI analysis even if a cached result exists"
+    )
     parser.add_argument(
         "--json",
         action="store_true",
@@ -58,11 +63,12 @@ Configuration:
             slack_url=args.slack_url,
             project_key=args.project,
             issue_type=args.type,
-            dry_run=args.dry_run
+            dry_run=args.dry_run,
+            no_cache=args.no_cache
         )
         
         if args.json:
-            print(json.dumps(result, indent=2))
+            print(jsonlib.dumps(result, indent=True))
         
         sys.exit(0)
         
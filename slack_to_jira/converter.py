@@ -3,6 +3,7 @@ Main orchestrator for Slack to Jira conversion.
 """
 
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
 from config import (
@@ -12,6 +13,7 @@ from config import (
     JIRA_PROJECT_KEY,
     JIRA_ISSUE_TYPE,
     GROQ_API_KEY,
+    GROQ_CACHE_TTL_DAYS,
 )
 from .slack_client import SlackClient
 from .ai_analyzer import GroqAnalyzer
@@ -32,10 +34,24 @@ class SlackToJira:
         
         self._validate_config()
         
-        # Initialize clients
+        # Initialize clients; AI and Jira are built on first use
         self.slack = SlackClient(self.slack_token)
-        self.ai = GroqAnalyzer(self.groq_key)
-        self.jira = JiraClient(self.jira_url, self.jira_token)
+        self._ai = None
+        self._jira = None
+    
+    @property
+    def ai(self) -> GroqAnalyzer:
+        """Groq analyzer, created on first use."""
+        if self._ai is None:
+            self._ai = GroqAnalyzer(self.groq_key, cache_ttl=GROQ_CACHE_TTL_DAYS * 24 * 3600)
+        return self._ai
+    
+    @property
+    def jira(self) -> JiraClient:
+        """Jira client, created on first use."""
+        if self._jira is None:
+            self._jira = JiraClient(self.jira_url, self.jira_token)
+        return self._jira
     
     def _validate_config(self):
         """Validate required configuration."""
@@ -63,7 +79,8 @@ class SlackToJira:
         slack_url: str,
         project_key: Optional[str] = None,
         issue_type: Optional[str] = None,
-        dry_run: bool = False
+        dry_run: bool = False,
+        no_cache: bool = False
     ) -> dict:
         """
         Process a Slack URL and create a Jira issue.
@@ -73,6 +90,7 @@ class SlackToJira:
             project_key: Override default Jira project
             issue_type: Override issue type
             dry_run: If True, don't create the issue, just show what would be created
+            no_cache: If True, ignore any cached AI analysis for this thread
         
         Returns:
             dict with issue details and status
@@ -95,21 +113,44 @@ class SlackToJira:
             channel_name = "unknown"
             print(f"   Could not get channel name: {e}")
         
-        # Fetch thread messages
+        # Fetch thread messages, resolving each page's authors while the
+        # next page is being fetched
         print("💬 Fetching thread messages...")
-        messages = self.slack.get_thread_messages(channel_id, thread_ts)
+        messages = []
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            lookups = []
+            for page in self.slack.iter_thread_pages(channel_id, thread_ts):
+                messages.extend(page)
+                lookups.append(executor.submit(
+                    self.slack.resolve_users,
+                    [msg.get("user", "Unknown") for msg in page]
+                ))
+            for lookup in lookups:
+                lookup.result()
         print(f"   Found {len(messages)} message(s)")
         
         if not messages:
             raise Exception("No messages found in thread")
         
         # Format messages for analysis
-        thread_content = self.slack.format_messages(messages)
-        print(f"   Thread content: {len(thread_content)} characters")
+        # Readable text for Jira; a compact variant for the AI prompt
+        thread_content = self.slack.format_messages_for_jira(messages)
+        prompt_content = self.slack.format_messages_for_llm(messages)
+        print(f"   Thread content: {len(thread_content)} characters ({len(prompt_content)} sent to AI)")
         
         # Analyze with Groq
         print("🤖 Analyzing thread with Groq AI...")
-        analysis = self.ai.analyze_thread(thread_content, channel_name)
+        analysis = self.ai.analyze_thread(
+            prompt_content,
+            channel_name,
+            force_refresh=no_cache,
+            display_content=thread_content,
+            message_count=len(messages)
+        )
+        if analysis.get("analysis_source") == "trivial":
+            print("   Thread too short to summarize, using its text directly")
+        if analysis.get("cache"):
+            print(f"   Reused cached analysis ({analysis['cache']} match)")
         print(f"   Generated title: {analysis.get('title', 'N/A')}")
         print(f"   Suggested type: {analysis.get('issue_type', 'N/A')}")
         print(f"   Suggested priority: {analysis.get('priority', 'N/A')}")
@@ -2,8 +2,11 @@
 Jira client for creating issues.
 """
 
-from typing import Optional
-from jira import JIRA
+from functools import cached_property
+from typing import Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from jira import JIRA
 
 
 class JiraClient:
@@ -13,9 +16,19 @@ class JiraClient:
         self.server = server.rstrip('/')
         self.token = token
     
-    def _get_jira(self) -> JIRA:
-        """Create fresh authenticated JIRA connection."""
-        return JIRA(server=self.server, token_auth=self.token)
+    @cached_property
+    def jira(self) -> "JIRA":
+        """Authenticated JIRA connection, created on first use."""
+        # Imported here: the jira package is slow to load and unused on dry runs
+        from jira import JIRA
+        return JIRA(
+            server=self.server,
+            token_auth=self.token,
+            options={"verify": True},
+            max_retries=3,
+            # Skip the /serverInfo round-trip; the first real call checks auth
+            get_server_info=False,
+        )
     
     def create_issue(
         self,
@@ -34,9 +47,6 @@ class JiraClient:
         if slack_url:
             description += f"\n\n----\n*Source:* Created from Slack discussion: {slack_url}"
         
-        # Create fresh JIRA client (like working script does)
-        jira = self._get_jira()
-        
         # Try creating with full fields first
         issue_dict = {
             "project": {"key": project_key},
@@ -46,7 +56,7 @@ class JiraClient:
         }
         
         try:
-            issue = jira.create_issue(fields=issue_dict)
+            issue = self.jira.create_issue(fields=issue_dict)
             return {"key": issue.key, "id": issue.id, "self": issue.self}
         except Exception as e:
             error_msg = str(e)
@@ -68,16 +78,13 @@ class JiraClient:
     ) -> dict:
         """Create issue with only project/issuetype, add details as comment."""
         
-        # Create fresh JIRA client
-        jira = self._get_jira()
-        
-        # Create with minimal fields
+        # Create with minimal fields (same connection as the failed attempt)
         minimal_dict = {
             "project": {"key": project_key},
             "issuetype": {"name": issue_type}
         }
         
-        issue = jira.create_issue(fields=minimal_dict)
+        issue = self.jira.create_issue(fields=minimal_dict)
         
         # Build comment with all the details
         comment_text = f"h3. {title}\n\n{description}"
@@ -85,6 +92,6 @@ class JiraClient:
             comment_text += f"\n\n*Suggested Priority:* {priority}"
         
         # Add as comment
-        jira.add_comment(issue, comment_text)
+        self.jira.add_comment(issue, comment_text)
         
         return {"key": issue.key, "id": issue.id, "self": issue.self}
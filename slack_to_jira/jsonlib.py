@@ -0,0 +1,24 @@
+"""
+JSON helpers that use orjson when available, falling back to stdlib json.
+"""
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+    import json
+
+
+def loads(data):
+    """Parse JSON from str or bytes (e.g. response.content)."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj, indent: bool = False) -> str:
+    """Serialize obj to a JSON string, optionally indented by two spaces."""
+    if orjson is not None:
+        option = orjson.OPT_INDENT_2 if indent else 0
+        return orjson.dumps(obj, option=option).decode()
+    return json.dumps(obj, indent=2 if indent else None)
@@ -0,0 +1,25 @@
+"""
+Shared HTTP session setup for the API clients.
+"""
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+def build_session(headers: dict) -> requests.Session:
+    """Create a keep-alive session with retry/backoff for transient errors."""
+    session = requests.Session()
+    session.headers.update(headers)
+    
+    retry = Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET", "POST"],
+        # Hand the final response back so callers can inspect the status
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=10, max_retries=retry)
+    session.mount("https://", adapter)
+    return session
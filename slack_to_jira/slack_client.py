@@ -2,21 +2,72 @@
 Slack API client for fetching thread messages.
 """
 
-import requests
-from urllib.parse import urlparse
+import os
+import re
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from typing import Optional
 
+from . import jsonlib
+from .cache import CACHE_DIR, open_cache_db
+from .session import build_session
+
+
+# Cached user names are refreshed after this many seconds; names rarely change
+USER_CACHE_TTL = 30 * 24 * 3600
+
+# Users Slack couldn't resolve (deleted, foreign, bots) are retried after this
+FAILED_USER_TTL = 3600
+
+# Above this many unknown users, one users.list sweep beats per-user lookups
+BULK_USER_FETCH_THRESHOLD = 3
+
+# users.list is tightly rate limited; on large workspaces each run reads at
+# most this many pages, resuming where the previous run stopped
+BULK_USER_MAX_PAGES = 5
+
+# Parallel users.info requests; kept low to stay inside Slack's rate limits
+USER_FETCH_CONCURRENCY = int(os.environ.get("SLACK_USER_FETCH_CONCURRENCY", "5"))
+
+# https://<workspace>.slack.com/archives/<channel>/p<ts><us>[?...thread_ts=<ts>]
+_SLACK_URL_RE = re.compile(
+    r'^https?://[^/]+/archives/(?P<channel>[A-Z0-9]+)/p(?P<ts>\d{10})(?P<us>\d{6})(?=[/?#]|$)'
+    r'(?:\?(?:[^#]*?&)?thread_ts=(?P<tts>[\d.]+))?'
+)
+
+
+class SlackRateLimitError(Exception):
+    """Raised when Slack answers with HTTP 429."""
+
 
 class SlackClient:
     """Client for interacting with Slack API."""
     
+    _user_cache_path = CACHE_DIR / "users.sqlite"
+    
     def __init__(self, token: str):
         self.token = token
         self.base_url = "https://slack.com/api"
         self.headers = {
             "Authorization": f"Bearer {token}",
         }
+        self.session = build_session(self.headers)
+        self._user_db = open_cache_db(self._user_cache_path)
+        self._user_db.execute(
+            "CREATE TABLE IF NOT EXISTS users("
+            "id TEXT PRIMARY KEY, name TEXT, real_name TEXT, fetched_at INTEGER)"
+        )
+        # Single-row progress of the users.list sweep across runs
+        self._user_db.execute(
+            "CREATE TABLE IF NOT EXISTS user_sweep("
+            "id INTEGER PRIMARY KEY CHECK (id = 1), cursor TEXT, completed_at INTEGER)"
+        )
+        self._user_db.commit()
+        self._user_lock = threading.Lock()
+        self._users = {}
+        self._swept = False
     
     def parse_slack_url(self, url: str) -> tuple[str, str, Optional[str]]:
         """
@@ -26,105 +77,231 @@ class SlackClient:
         - https://workspace.slack.com/archives/C01234567/p1234567890123456
         - https://workspace.slack.com/archives/C01234567/p1234567890123456?thread_ts=1234567890.123456
         """
-        parsed = urlparse(url)
-        path_parts = parsed.path.strip('/').split('/')
-        
-        if len(path_parts) < 3 or path_parts[0] != 'archives':
+        match = _SLACK_URL_RE.match(url)
+        if not match:
             raise ValueError(f"Invalid Slack URL format: {url}")
         
-        channel_id = path_parts[1]
-        message_id = path_parts[2]
-        
-        # Convert message ID (p1234567890123456) to timestamp (1234567890.123456)
-        if message_id.startswith('p'):
-            ts = message_id[1:]
-            # Insert decimal point: 1234567890123456 -> 1234567890.123456
-            if len(ts) > 6:
-                thread_ts = f"{ts[:-6]}.{ts[-6:]}"
-            else:
-                thread_ts = ts
-        else:
-            thread_ts = message_id
-        
-        # Check for thread_ts in query params
-        query_thread_ts = None
-        if parsed.query:
-            for param in parsed.query.split('&'):
-                if param.startswith('thread_ts='):
-                    query_thread_ts = param.split('=')[1]
-                    break
-        
-        return channel_id, thread_ts, query_thread_ts
+        # Message ID p1234567890123456 -> timestamp 1234567890.123456
+        return match["channel"], f"{match['ts']}.{match['us']}", match["tts"]
     
     def get_channel_info(self, channel_id: str) -> dict:
         """Get information about a channel."""
-        response = requests.get(
+        response = self.session.get(
             f"{self.base_url}/conversations.info",
-            headers=self.headers,
             params={"channel": channel_id}
         )
-        data = response.json()
+        data = jsonlib.loads(response.content)
         if not data.get("ok"):
             raise Exception(f"Failed to get channel info: {data.get('error', 'Unknown error')}")
         return data.get("channel", {})
     
     def get_user_info(self, user_id: str) -> dict:
         """Get information about a user."""
-        response = requests.get(
+        return self.resolve_users([user_id])[user_id]
+    
+    def _fetch_user_info(self, user_id: str) -> Optional[dict]:
+        """Fetch a single user via users.info, or None if Slack can't resolve it."""
+        response = self.session.get(
             f"{self.base_url}/users.info",
-            headers=self.headers,
             params={"user": user_id}
         )
-        data = response.json()
+        if response.status_code == 429:
+            raise SlackRateLimitError(f"Rate limited fetching user {user_id}")
+        data = jsonlib.loads(response.content)
         if not data.get("ok"):
-            return {"name": user_id, "real_name": user_id}
-        user = data.get("user", {})
+            return None
+        return self._user_summary(user_id, data.get("user", {}))
+    
+    @staticmethod
+    def _user_summary(user_id: str, user: dict) -> dict:
+        """Reduce a Slack user object to the fields we use."""
         return {
             "name": user.get("name", user_id),
             "real_name": user.get("real_name", user.get("name", user_id))
         }
     
-    def get_thread_messages(self, channel_id: str, thread_ts: str) -> list[dict]:
-        """Fetch all messages from a Slack thread."""
-        messages = []
+    def _fetch_all_users(self, wanted: set[str]) -> dict[str, dict]:
+        """
+        Sweep workspace users via paginated users.list.
+        
+        Runs at most once per client. Each sweep resumes from the cursor
+        where the previous one stopped and reads up to BULK_USER_MAX_PAGES
+        pages, stopping early once every wanted user has been seen or at
+        the first failed page; users from pages already read are returned
+        either way. Once the whole directory has been read, sweeps are
+        skipped until USER_CACHE_TTL expires, since users.list can't
+        resolve anyone it didn't already return.
+        """
+        if self._swept:
+            return {}
+        self._swept = True
+        
+        row = self._user_db.execute(
+            "SELECT cursor, completed_at FROM user_sweep WHERE id = 1"
+        ).fetchone()
+        cursor, completed_at = row if row else (None, None)
+        if completed_at and completed_at >= int(time.time()) - USER_CACHE_TTL:
+            return {}
+        
+        users = {}
+        completed_at = None
+        for _ in range(BULK_USER_MAX_PAGES):
+            params = {"limit": 200}
+            if cursor:
+                params["cursor"] = cursor
+            
+            try:
+                response = self.session.get(
+                    f"{self.base_url}/users.list",
+                    params=params
+                )
+                data = jsonlib.loads(response.content)
+            except Exception:
+                break
+            if not data.get("ok"):
+                # Stored cursors can expire; start over on the next sweep
+                if data.get("error") == "invalid_cursor":
+                    cursor = None
+                break
+            
+            for member in data.get("members", []):
+                user_id = member.get("id")
+                if user_id:
+                    users[user_id] = self._user_summary(user_id, member)
+            
+            cursor = data.get("response_metadata", {}).get("next_cursor")
+            if not cursor:
+                completed_at = int(time.time())
+                break
+            if wanted <= users.keys():
+                break
+        
+        with self._user_db:
+            self._user_db.execute(
+                "INSERT OR REPLACE INTO user_sweep(id, cursor, completed_at) VALUES (1, ?, ?)",
+                (cursor or None, completed_at)
+            )
+        return users
+    
+    def _load_cached_users(self, user_ids: set[str]) -> dict[str, dict]:
+        """
+        Read still-fresh users from the on-disk cache.
+        
+        Rows with a NULL name record a failed lookup and resolve to the
+        raw user ID until FAILED_USER_TTL expires.
+        """
+        if not user_ids:
+            return {}
+        now = int(time.time())
+        placeholders = ",".join("?" * len(user_ids))
+        rows = self._user_db.execute(
+            f"SELECT id, name, real_name FROM users "
+            f"WHERE id IN ({placeholders}) AND ("
+            f"(name IS NOT NULL AND fetched_at >= ?) OR (name IS NULL AND fetched_at >= ?))",
+            [*user_ids, now - USER_CACHE_TTL, now - FAILED_USER_TTL]
+        ).fetchall()
+        return {
+            uid: {"name": name or uid, "real_name": real_name or uid}
+            for uid, name, real_name in rows
+        }
+    
+    def _store_users(self, users: dict[str, Optional[dict]]):
+        """
+        Upsert users into the on-disk cache in a single transaction.
+        
+        A None value records a failed lookup.
+        """
+        now = int(time.time())
+        with self._user_db:
+            self._user_db.executemany(
+                "INSERT OR REPLACE INTO users(id, name, real_name, fetched_at) "
+                "VALUES (?, ?, ?, ?)",
+                [
+                    (uid, u["name"], u["real_name"], now) if u else (uid, None, None, now)
+                    for uid, u in users.items()
+                ]
+            )
+    
+    def resolve_users(self, user_ids) -> dict[str, dict]:
+        """
+        Resolve user IDs to user info, reading through the on-disk cache.
+        
+        Users missing from the cache are fetched with a single users.list
+        sweep when there are many of them, otherwise one users.info each.
+        Results are memoized for the life of the client. Safe to call from
+        a worker thread.
+        """
+        with self._user_lock:
+            needed = set(user_ids)
+            users = {uid: self._users[uid] for uid in needed if uid in self._users}
+            needed -= users.keys()
+            
+            cached = self._load_cached_users(needed)
+            users.update(cached)
+            needed -= cached.keys()
+            
+            fetched = {}
+            if len(needed) > BULK_USER_FETCH_THRESHOLD:
+                fetched = self._fetch_all_users(needed)
+            
+            fetched.update(self._fetch_users_parallel(needed - fetched.keys()))
+            
+            if fetched:
+                self._store_users(fetched)
+            
+            # Users that were never looked up (rate limited) are not cached
+            for user_id in needed:
+                users[user_id] = fetched.get(user_id) or {"name": user_id, "real_name": user_id}
+            
+            self._users.update(users)
+            return users
+    
+    def iter_thread_pages(self, channel_id: str, thread_ts: str):
+        """Yield the messages of a Slack thread one page at a time."""
         cursor = None
         
         while True:
             params = {
                 "channel": channel_id,
                 "ts": thread_ts,
-                "limit": 100
+                # Slack's maximum page size; only user/ts/text/attachments/files are read
+                "limit": 1000,
+                "include_all_metadata": "false"
             }
             if cursor:
                 params["cursor"] = cursor
             
-            response = requests.get(
+            response = self.session.get(
                 f"{self.base_url}/conversations.replies",
-                headers=self.headers,
                 params=params
             )
-            data = response.json()
+            data = jsonlib.loads(response.content)
             
             if not data.get("ok"):
                 # If thread not found, try to get single message
                 if data.get("error") == "thread_not_found":
-                    return self._get_single_message(channel_id, thread_ts)
+                    yield self._get_single_message(channel_id, thread_ts)
+                    return
                 raise Exception(f"Failed to fetch thread: {data.get('error', 'Unknown error')}")
             
-            messages.extend(data.get("messages", []))
+            yield data.get("messages", [])
             
             # Check for pagination
             cursor = data.get("response_metadata", {}).get("next_cursor")
             if not cursor:
                 break
-        
+    
+    def get_thread_messages(self, channel_id: str, thread_ts: str) -> list[dict]:
+        """Fetch all messages from a Slack thread."""
+        messages = []
+        for page in self.iter_thread_pages(channel_id, thread_ts):
+            messages.extend(page)
         return messages
     
     def _get_single_message(self, channel_id: str, ts: str) -> list[dict]:
         """Get a single message by timestamp."""
-        response = requests.get(
+        response = self.session.get(
             f"{self.base_url}/conversations.history",
-            headers=self.headers,
             params={
                 "channel": channel_id,
                 "latest": ts,
@@ -133,38 +310,122 @@ class SlackClient:
                 "limit": 1
             }
         )
-        data = response.json()
+        data = jsonlib.loads(response.content)
         if not data.get("ok"):
             raise Exception(f"Failed to fetch message: {data.get('error', 'Unknown error')}")
         return data.get("messages", [])
     
+    def _fetch_users_parallel(self, user_ids: set[str]) -> dict[str, Optional[dict]]:
+        """
+        Fetch users via users.info concurrently.
+        
+        Users Slack could not resolve map to None. Stops submitting work as
+        soon as Slack rate limits us; users that were not fetched are left
+        out of the result.
+        """
+        users = {}
+        if not user_ids:
+            return users
+        
+        executor = ThreadPoolExecutor(max_workers=max(1, USER_FETCH_CONCURRENCY))
+        try:
+            futures = {
+                executor.submit(self._fetch_user_info, user_id): user_id
+                for user_id in user_ids
+            }
+            for future in as_completed(futures):
+                try:
+                    user = future.result()
+                except SlackRateLimitError:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    break
+                users[futures[future]] = user
+        finally:
+            executor.shutdown(wait=True)
+        
+        return users
+    
     def format_messages(self, messages: list[dict]) -> str:
-        """Format messages into readable text for AI analysis."""
-        formatted = []
-        user_cache = {}
+        """Format messages into readable text (same as format_messages_for_jira)."""
+        return self.format_messages_for_jira(messages)
+    
+    def format_messages_for_jira(self, messages: list[dict]) -> str:
+        """Format messages into readable text for the Jira description."""
+        parts = []
+        user_cache = self.resolve_users(msg.get("user", "Unknown") for msg in messages)
+        append = parts.append
+        
+        # Many messages share a minute; format each distinct minute once
+        stamps = {}
         
         for msg in messages:
             user_id = msg.get("user", "Unknown")
-            if user_id not in user_cache:
-                user_cache[user_id] = self.get_user_info(user_id)
-            
             user_name = user_cache[user_id].get("real_name", user_id)
-            timestamp = datetime.fromtimestamp(float(msg.get("ts", 0)))
-            text = msg.get("text", "")
+            
+            minute = int(float(msg.get("ts", 0))) // 60
+            stamp = stamps.get(minute)
+            if stamp is None:
+                stamp = stamps[minute] = datetime.fromtimestamp(minute * 60).strftime('%Y-%m-%d %H:%M')
+            
+            if parts:
+                append("\n")
+            append(f"[{stamp}] {user_name}:\n")
+            append(msg.get("text", ""))
             
             # Handle attachments
-            attachments = msg.get("attachments", [])
-            for att in attachments:
+            for att in msg.get("attachments", []):
                 if att.get("text"):
-                    text += f"\n[Attachment: {att.get('text')}]"
+                    append(f"\n[Attachment: {att.get('text')}]")
                 if att.get("title"):
-                    text += f"\n[Attachment Title: {att.get('title')}]"
+                    append(f"\n[Attachment Title: {att.get('title')}]")
             
             # Handle files
-            files = msg.get("files", [])
-            for f in files:
-                text += f"\n[File: {f.get('name', 'unnamed')} - {f.get('mimetype', 'unknown type')}]"
+            for f in msg.get("files", []):
+                append(f"\n[File: {f.get('name', 'unnamed')} - {f.get('mimetype', 'unknown type')}]")
+            
+            append("\n")
+        
+        return "".join(parts)
+    
+    def format_messages_for_llm(self, messages: list[dict]) -> str:
+        """
+        Format messages compactly for the AI prompt.
+        
+        Authors get one-letter aliases (listed once up front), only the first
+        and last messages keep a timestamp, files drop their mimetype and
+        attachments collapse to a marker.
+        """
+        user_cache = self.resolve_users(msg.get("user", "Unknown") for msg in messages)
+        
+        aliases = {}
+        for msg in messages:
+            user_id = msg.get("user", "Unknown")
+            if user_id not in aliases:
+                n = len(aliases)
+                aliases[user_id] = chr(ord("A") + n) if n < 26 else f"P{n + 1}"
+        
+        legend = ", ".join(
+            f"{alias}={user_cache[user_id].get('real_name', user_id)}"
+            for user_id, alias in aliases.items()
+        )
+        parts = [f"Participants: {legend}\n"]
+        append = parts.append
+        last = len(messages) - 1
+        
+        for i, msg in enumerate(messages):
+            alias = aliases[msg.get("user", "Unknown")]
+            if i == 0 or i == last:
+                stamp = datetime.fromtimestamp(float(msg.get("ts", 0))).strftime('%Y-%m-%d %H:%M')
+                append(f"[{stamp}] {alias}: ")
+            else:
+                append(f"{alias}: ")
+            append(msg.get("text", ""))
+            
+            if msg.get("attachments"):
+                append(" [+att]")
+            for f in msg.get("files", []):
+                append(f"\n[File: {f.get('name', 'unnamed')}]")
             
-            formatted.append(f"[{timestamp.strftime('%Y-%m-%d %H:%M')}] {user_name}:\n{text}\n")
+            append("\n")
         
-        return "\n".join(formatted)
+        return "".join(parts)